@@ -1,213 +1,398 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
-from types import SimpleNamespace
-import os
-
-class AttendanceAnalytics:
-    def __init__(self, filepath):
-        self.df = pd.read_csv(filepath)
-        self.student_names = self.df['Name']
-        self.dates = self.df.columns[1:]
-        self.attendance_data = self.df.iloc[:, 1:]
-        
-    def get_monthly_attendance(self):
-        """Calculate monthly attendance statistics"""
-        monthly_stats = {}
-        for date in self.dates:
-            month = datetime.strptime(date, '%Y-%m-%d').strftime('%Y-%m')
-            if month not in monthly_stats:
-                monthly_stats[month] = {'present': 0, 'total': 0}
-            monthly_stats[month]['total'] += len(self.student_names)
-            monthly_stats[month]['present'] += sum(self.attendance_data[date].str.upper() == 'P')
-        
-        return {month: (stats['present']/stats['total']*100) 
-                for month, stats in monthly_stats.items()}
-    
-    def get_attendance_patterns(self):
-        """Analyze attendance patterns by day of week"""
-        day_patterns = {}
-        for date in self.dates:
-            day = datetime.strptime(date, '%Y-%m-%d').strftime('%A')
-            if day not in day_patterns:
-                day_patterns[day] = {'present': 0, 'total': 0}
-            day_patterns[day]['total'] += len(self.student_names)
-            day_patterns[day]['present'] += sum(self.attendance_data[date].str.upper() == 'P')
-        
-        return {day: (stats['present']/stats['total']*100) 
-                for day, stats in day_patterns.items()}
-    
-    def get_student_trends(self):
-        """Calculate attendance trends for each student"""
-        trends = {}
-        for idx, student in enumerate(self.student_names):
-            attendance = self.attendance_data.iloc[idx]
-            present_days = sum(attendance.str.upper() == 'P')
-            total_days = len(self.dates)
-            trends[student] = {
-                'attendance_rate': (present_days/total_days*100),
-                'total_present': present_days,
-                'total_absent': total_days - present_days
-            }
-        return trends
-    
-    def get_student_data(self, student_name):
-        """Get detailed data for a specific student"""
-        # Find the student index
-        student_idx = None
-        for idx, name in enumerate(self.student_names):
-            if name == student_name:
-                student_idx = idx
-                break
-                
-        if student_idx is None:
-            return None
-            
-        # Get student's attendance data
-        attendance = self.attendance_data.iloc[student_idx]
-        present_days = sum(attendance.str.upper() == 'P')
-        total_days = len(self.dates)
-        attendance_rate = (present_days/total_days*100)
-        
-        # Create attendance calendar
-        attendance_calendar = {}
-        for date in self.dates:
-            attendance_calendar[date] = attendance[date]
-            
-        # Calculate monthly performance
-        monthly_performance = {}
-        for date in self.dates:
-            month = datetime.strptime(date, '%Y-%m-%d').strftime('%Y-%m')
-            if month not in monthly_performance:
-                monthly_performance[month] = {'present': 0, 'total': 0}
-            monthly_performance[month]['total'] += 1
-            if attendance[date].upper() == 'P':
-                monthly_performance[month]['present'] += 1
-                
-        # Calculate rates for each month
-        for month in monthly_performance:
-            total = monthly_performance[month]['total']
-            present = monthly_performance[month]['present']
-            monthly_performance[month]['rate'] = (present/total*100)
-            monthly_performance[month]['absent'] = total - present
-        
-        # Create student data object
-        student_data = SimpleNamespace()
-        student_data.name = student_name
-        student_data.attendance_rate = attendance_rate
-        student_data.total_present = present_days
-        student_data.total_absent = total_days - present_days
-        student_data.attendance_calendar = attendance_calendar
-        student_data.monthly_performance = monthly_performance
-        
-        return student_data
-    
-    def generate_enhanced_graphs(self):
-        """Generate additional analytical graphs"""
-        # Ensure static directory exists
-        os.makedirs("static", exist_ok=True)
-        
-        # Calculate basic statistics
-        present_count = self.attendance_data.apply(lambda row: sum(val.upper() == 'P' for val in row), axis=1)
-        total_classes = len(self.dates)
-        attendance_percent = (present_count / total_classes * 100).round(2)
-        
-        # Generate basic graphs (from the original graphs.py)
-        # Bar Chart
-        plt.figure(figsize=(10, 5))
-        plt.bar(self.student_names, attendance_percent, color='skyblue')
-        plt.xticks(rotation=45, ha='right')
-        plt.title("Student Attendance %")
-        plt.ylabel("Percentage")
-        plt.tight_layout()
-        plt.savefig("static/attendance_percent_chart.png")
-        plt.close()
-
-        # Line Chart
-        plt.figure(figsize=(10, 5))
-        plt.plot(self.student_names, attendance_percent, marker='o', color='green')
-        plt.xticks(rotation=45, ha='right')
-        plt.title("Attendance Trend")
-        plt.ylabel("Percentage")
-        plt.tight_layout()
-        plt.savefig("static/attendance_trend_line.png")
-        plt.close()
-
-        # Pie Chart
-        total_present = present_count.sum()
-        total_absent = total_classes * len(self.student_names) - total_present
-        plt.figure(figsize=(6, 6))
-        plt.pie([total_present, total_absent], labels=["Present", "Absent"],
-                autopct='%1.1f%%', colors=["#4CAF50", "#F44336"])
-        plt.title("Overall Attendance")
-        plt.savefig("static/overall_attendance_pie.png")
-        plt.close()
-        
-        # Generate enhanced graphs
-        # Monthly attendance trend
-        monthly_stats = self.get_monthly_attendance()
-        plt.figure(figsize=(12, 6))
-        plt.plot(list(monthly_stats.keys()), list(monthly_stats.values()), marker='o')
-        plt.title('Monthly Attendance Trend')
-        plt.xlabel('Month')
-        plt.ylabel('Attendance Rate (%)')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig('static/monthly_attendance_trend.png')
-        plt.close()
-        
-        # Day-wise attendance pattern
-        day_patterns = self.get_attendance_patterns()
-        plt.figure(figsize=(10, 6))
-        plt.bar(day_patterns.keys(), day_patterns.values())
-        plt.title('Attendance by Day of Week')
-        plt.xlabel('Day')
-        plt.ylabel('Attendance Rate (%)')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig('static/day_wise_attendance.png')
-        plt.close()
-        
-        # Student attendance heatmap
-        plt.figure(figsize=(15, 8))
-        attendance_matrix = self.attendance_data.applymap(lambda x: 1 if x.upper() == 'P' else 0)
-        sns.heatmap(attendance_matrix, cmap='RdYlGn', 
-                   xticklabels=True, yticklabels=self.student_names)
-        plt.title('Student Attendance Heatmap')
-        plt.xlabel('Date')
-        plt.ylabel('Student')
-        plt.tight_layout()
-        plt.savefig('static/attendance_heatmap.png')
-        plt.close()
-        
-        # Save summary report
-        summary_df = pd.DataFrame({
-            'Name': self.student_names,
-            'Present': present_count,
-            'Attendance (%)': attendance_percent
-        })
-        summary_df.to_csv("static/attendance_report.csv", index=False)
-    
-    def get_summary_statistics(self):
-        """Get comprehensive summary statistics"""
-        student_trends = self.get_student_trends()
-        monthly_stats = self.get_monthly_attendance()
-        day_patterns = self.get_attendance_patterns()
-        
-        stats = SimpleNamespace()
-        stats.total_students = len(self.student_names)
-        stats.average_attendance = np.mean([trend['attendance_rate'] 
-                                          for trend in student_trends.values()])
-        stats.monthly_stats = monthly_stats
-        stats.day_patterns = day_patterns
-        stats.student_trends = student_trends
-        
-        # Calculate additional metrics
-        stats.most_consistent_day = max(day_patterns.items(), key=lambda x: x[1])[0]
-        stats.least_consistent_day = min(day_patterns.items(), key=lambda x: x[1])[0]
-        stats.best_month = max(monthly_stats.items(), key=lambda x: x[1])[0]
-        stats.worst_month = min(monthly_stats.items(), key=lambda x: x[1])[0]
-        
-        return stats 
\ No newline at end of file
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # headless backend; safe for worker processes
+import matplotlib.pyplot as plt
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from functools import cached_property
+import os
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; fall back to the vectorized path
+    njit = None
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _present_mask(codes):
+        """Compiled case-insensitive 'P' test over a code-point matrix"""
+        out = np.empty(codes.shape, np.bool_)
+        for i in prange(codes.shape[0]):
+            for j in range(codes.shape[1]):
+                c = codes[i, j]
+                out[i, j] = (c == ord('P')) | (c == ord('p'))
+        return out
+
+    @njit(parallel=True, cache=True)
+    def _student_counts(mask):
+        """Threaded row-wise presence count over the bool matrix"""
+        n, m = mask.shape
+        counts = np.empty(n, np.int64)
+        for i in prange(n):
+            s = 0
+            for j in range(m):
+                s += mask[i, j]
+            counts[i] = s
+        return counts
+
+# Figure renderers run in worker processes, so they are module-level
+# functions taking plain data arrays plus the output path
+
+def _render_bar_chart(names, percent, outpath):
+    plt.figure(figsize=(10, 5))
+    plt.bar(names, percent, color='skyblue')
+    plt.xticks(rotation=45, ha='right')
+    plt.title("Student Attendance %")
+    plt.ylabel("Percentage")
+    plt.tight_layout()
+    plt.savefig(outpath)
+    plt.close()
+
+def _render_line_chart(names, percent, outpath):
+    plt.figure(figsize=(10, 5))
+    plt.plot(names, percent, marker='o', color='green')
+    plt.xticks(rotation=45, ha='right')
+    plt.title("Attendance Trend")
+    plt.ylabel("Percentage")
+    plt.tight_layout()
+    plt.savefig(outpath)
+    plt.close()
+
+def _render_pie_chart(total_present, total_absent, outpath):
+    plt.figure(figsize=(6, 6))
+    plt.pie([total_present, total_absent], labels=["Present", "Absent"],
+            autopct='%1.1f%%', colors=["#4CAF50", "#F44336"])
+    plt.title("Overall Attendance")
+    plt.savefig(outpath)
+    plt.close()
+
+def _render_monthly_trend(monthly_stats, outpath):
+    plt.figure(figsize=(12, 6))
+    plt.plot(list(monthly_stats.keys()), list(monthly_stats.values()), marker='o')
+    plt.title('Monthly Attendance Trend')
+    plt.xlabel('Month')
+    plt.ylabel('Attendance Rate (%)')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(outpath)
+    plt.close()
+
+def _render_day_patterns(day_patterns, outpath):
+    plt.figure(figsize=(10, 6))
+    plt.bar(day_patterns.keys(), day_patterns.values())
+    plt.title('Attendance by Day of Week')
+    plt.xlabel('Day')
+    plt.ylabel('Attendance Rate (%)')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(outpath)
+    plt.close()
+
+def _render_heatmap(matrix, names, dates, outpath):
+    plt.figure(figsize=(15, 8))
+    # imshow draws the matrix as a single raster instead of seaborn's
+    # per-cell mesh, which gets slow on wide sheets; thin out the date
+    # ticks so only ~20 labels are drawn
+    plt.imshow(matrix, aspect='auto', cmap='RdYlGn', interpolation='nearest')
+    plt.colorbar(label='Attendance')
+    step = max(1, len(dates) // 20)
+    plt.xticks(range(0, len(dates), step), dates[::step], rotation=45)
+    plt.yticks(range(len(names)), names)
+    plt.title('Student Attendance Heatmap')
+    plt.xlabel('Date')
+    plt.ylabel('Student')
+    plt.tight_layout()
+    plt.savefig(outpath)
+    plt.close()
+
+def _render(task):
+    func, args = task
+    func(*args)
+
+class AttendanceAnalytics:
+    PRESENCE_NPY = 'static/presence.npy'
+    PRESENCE_META = 'static/presence_meta.npz'
+
+    def __init__(self, filepath):
+        # Read the header first so the attendance columns can be loaded as
+        # category dtype: int8 codes instead of Python string objects, ~8x
+        # less memory and a cheap integer compare against 'P'
+        header = pd.read_csv(filepath, nrows=0).columns
+        self.df = pd.read_csv(filepath, dtype={col: 'category' for col in header[1:]})
+        self.student_names = self.df['Name']
+        self.dates = self.df.columns[1:]
+        self.attendance_data = self.df.iloc[:, 1:]
+        self._filepath = filepath
+        # Memoized results of the no-argument aggregations; repeat calls
+        # within a request (e.g. from get_summary_statistics and the graph
+        # generator) are then free
+        self._cache = {}
+
+    @cached_property
+    def present(self):
+        """Boolean presence matrix (students x dates), built exactly once so
+        every method can use plain NumPy reductions instead of re-running
+        str.upper() == 'P' over the DataFrame on each call"""
+        if njit is not None:
+            # Very wide sheets: run the compiled kernel over the raw
+            # code points, parallelized across student rows
+            codes = self.attendance_data.to_numpy(dtype='U1').view(np.uint32)
+            mask = _present_mask(codes)
+        else:
+            try:
+                # Case-insensitive test in a single fused pass: setting bit
+                # 0x20 lowercases ASCII letters, so 'P' and 'p' both compare
+                # equal without an upper-casing pass over the buffer first
+                codes = self.attendance_data.to_numpy(dtype='U1').view(np.uint32)
+                mask = (codes | np.uint32(0x20)) == np.uint32(ord('p'))
+            except (TypeError, ValueError):
+                # Pure-pandas fallback: equality against the int8 category
+                # codes, still far cheaper than object-dtype str methods
+                mask = np.column_stack(
+                    [self._present_column(self.attendance_data[col]) for col in self.dates])
+        self._save_presence_cache(mask)
+        return mask
+
+    @cached_property
+    def _date_idx(self):
+        return {date: j for j, date in enumerate(self.dates)}
+
+    @cached_property
+    def _dt_index(self):
+        """Date headers parsed once; reused by the monthly, day-of-week
+        and per-student aggregations"""
+        return pd.to_datetime(self.dates, format='%Y-%m-%d')
+
+    @cached_property
+    def _name_to_idx(self):
+        return {name: i for i, name in enumerate(self.student_names)}
+
+    @cached_property
+    def _month_codes(self):
+        return self._dt_index.strftime('%Y-%m').to_numpy()
+
+    @cached_property
+    def _day_names(self):
+        return self._dt_index.day_name().to_numpy()
+
+    @cached_property
+    def _month_groups(self):
+        """(unique months, inverse codes) for grouping per-student rows"""
+        return np.unique(self._month_codes, return_inverse=True)
+
+    def _save_presence_cache(self, mask):
+        """Persist the presence matrix so other worker processes can
+        memory-map it instead of re-parsing the CSV"""
+        try:
+            if (os.path.exists(self.PRESENCE_NPY)
+                    and os.path.getmtime(self.PRESENCE_NPY) >= os.path.getmtime(self._filepath)):
+                return
+            np.save(self.PRESENCE_NPY, mask)
+            np.savez(self.PRESENCE_META,
+                     names=self.student_names.to_numpy(),
+                     dates=np.asarray(self.dates))
+        except OSError:
+            pass  # the cache is best-effort only
+
+    @classmethod
+    def from_cache(cls, npy_path=PRESENCE_NPY, meta_path=PRESENCE_META):
+        """Build an instance from the memory-mapped presence cache without
+        touching the CSV; the bool matrix is shared via the OS page cache"""
+        meta = np.load(meta_path, allow_pickle=True)
+        analytics = cls.__new__(cls)
+        analytics.present = np.load(npy_path, mmap_mode='r')
+        analytics.student_names = pd.Series(meta['names'])
+        analytics.dates = pd.Index(meta['dates'])
+        # Reconstruct the raw P/A values from the mask for callers that
+        # need the attendance strings (e.g. the student calendar)
+        analytics.attendance_data = pd.DataFrame(
+            np.where(analytics.present, 'P', 'A'), columns=analytics.dates)
+        analytics._filepath = npy_path
+        analytics._cache = {}
+        return analytics
+
+    @staticmethod
+    def _present_column(col):
+        """Boolean presence for one categorical column via its int8 codes"""
+        is_p = col.cat.categories.str.upper().to_numpy() == 'P'
+        # missing values have code -1; append False so they count as absent
+        return np.append(is_p, False)[col.cat.codes.to_numpy()]
+
+    @cached_property
+    def _per_date_present(self):
+        """Presence count per date, computed once and shared"""
+        return self._present_f.sum(axis=0)
+
+    @cached_property
+    def _present_f(self):
+        """Column-major copy of the presence matrix so per-date (column)
+        reductions walk contiguous memory; the row-major original stays
+        the layout of choice for the per-student paths"""
+        return np.asfortranarray(self.present)
+
+    @cached_property
+    def _per_student_present(self):
+        """Presence count per student, computed once and shared"""
+        if njit is not None:
+            # SIMD row sums threaded over students
+            return _student_counts(np.ascontiguousarray(self.present))
+        return self.present.sum(axis=1)
+
+    def get_monthly_attendance(self, per_date_present=None):
+        """Calculate monthly attendance statistics"""
+        if 'monthly' not in self._cache:
+            if per_date_present is None:
+                per_date_present = self._per_date_present
+            codes, uniques = pd.factorize(self._month_codes)
+            present_sum = np.bincount(codes, weights=per_date_present)
+            count_sum = np.bincount(codes) * len(self.student_names)
+            self._cache['monthly'] = dict(zip(uniques, present_sum / count_sum * 100))
+        return self._cache['monthly']
+    
+    def get_attendance_patterns(self, per_date_present=None):
+        """Analyze attendance patterns by day of week"""
+        if 'day_patterns' not in self._cache:
+            if per_date_present is None:
+                per_date_present = self._per_date_present
+            codes, uniques = pd.factorize(self._day_names)
+            present_sum = np.bincount(codes, weights=per_date_present)
+            count_sum = np.bincount(codes) * len(self.student_names)
+            self._cache['day_patterns'] = dict(zip(uniques, present_sum / count_sum * 100))
+        return self._cache['day_patterns']
+    
+    def get_student_trends(self):
+        """Calculate attendance trends for each student"""
+        if 'student_trends' not in self._cache:
+            present_counts = self._per_student_present
+            total_days = len(self.dates)
+            rates = present_counts * (100.0 / total_days)
+            self._cache['student_trends'] = {
+                student: {
+                    'attendance_rate': rate,
+                    'total_present': int(count),
+                    'total_absent': total_days - int(count)
+                }
+                for student, rate, count in zip(self.student_names.to_numpy(), rates, present_counts)}
+        return self._cache['student_trends']
+    
+    def get_student_data(self, student_name):
+        """Get detailed data for a specific student"""
+        # Find the student index
+        student_idx = self._name_to_idx.get(student_name)
+        if student_idx is None:
+            return None
+            
+        # Get student's attendance data
+        present_days = int(self.present[student_idx].sum())
+        total_days = len(self.dates)
+        attendance_rate = (present_days/total_days*100)
+
+        # Create attendance calendar from one array extraction instead of
+        # a label lookup per date
+        values = self.attendance_data.to_numpy()[student_idx]
+        attendance_calendar = dict(zip(self.dates, values))
+
+        # Calculate monthly performance with one grouped reduction
+        month_unique, month_inverse = self._month_groups
+        row = self.present[student_idx].astype(np.int64)
+        present_by_month = np.bincount(month_inverse, weights=row,
+                                       minlength=len(month_unique))
+        totals_by_month = np.bincount(month_inverse, minlength=len(month_unique))
+        monthly_performance = {}
+        for month, present, total in zip(month_unique, present_by_month, totals_by_month):
+            monthly_performance[month] = {
+                'present': int(present),
+                'total': int(total),
+                'rate': (present/total*100),
+                'absent': int(total - present)
+            }
+        
+        # Create student data object
+        student_data = SimpleNamespace()
+        student_data.name = student_name
+        student_data.attendance_rate = attendance_rate
+        student_data.total_present = present_days
+        student_data.total_absent = total_days - present_days
+        student_data.attendance_calendar = attendance_calendar
+        student_data.monthly_performance = monthly_performance
+        
+        return student_data
+    
+    def generate_enhanced_graphs(self):
+        """Generate additional analytical graphs"""
+        # Ensure static directory exists
+        os.makedirs("static", exist_ok=True)
+        
+        # Calculate basic statistics from the precomputed presence matrix;
+        # keep everything as plain ndarrays to avoid intermediate Series
+        present_count = self._per_student_present
+        total_classes = len(self.dates)
+        attendance_percent = np.round(present_count * (100.0 / total_classes), 2)
+        
+        # The six figures are independent of each other, so render them in
+        # parallel worker processes; each task only gets the plain arrays
+        # it needs
+        names = self.student_names.to_numpy()
+        total_present = int(present_count.sum())
+        total_absent = total_classes * len(self.student_names) - total_present
+        # Share one per-date sum between the month and weekday rollups
+        per_date_present = self._per_date_present
+        tasks = [
+            (_render_bar_chart, (names, attendance_percent, "static/attendance_percent_chart.png")),
+            (_render_line_chart, (names, attendance_percent, "static/attendance_trend_line.png")),
+            (_render_pie_chart, (total_present, total_absent, "static/overall_attendance_pie.png")),
+            (_render_monthly_trend, (self.get_monthly_attendance(per_date_present), 'static/monthly_attendance_trend.png')),
+            (_render_day_patterns, (self.get_attendance_patterns(per_date_present), 'static/day_wise_attendance.png')),
+            (_render_heatmap, (self.present.astype(np.uint8), names, list(self.dates), 'static/attendance_heatmap.png')),
+        ]
+        # Spawn rather than fork: forked children inherit the threading
+        # state of numba's parallel kernels and hang at shutdown. The
+        # render functions are self-contained module-level callables, so
+        # they are spawn-safe.
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=ctx) as executor:
+            list(executor.map(_render, tasks))
+
+        # Save summary report straight from the arrays computed above
+        summary_df = pd.DataFrame({
+            'Name': self.student_names.to_numpy(),
+            'Present': present_count,
+            'Attendance (%)': attendance_percent
+        })
+        summary_df.to_csv("static/attendance_report.csv", index=False)
+    
+    def get_summary_statistics(self):
+        """Get comprehensive summary statistics"""
+        student_trends = self.get_student_trends()
+        monthly_stats = self.get_monthly_attendance()
+        day_patterns = self.get_attendance_patterns()
+        
+        stats = SimpleNamespace()
+        stats.total_students = len(self.student_names)
+        stats.average_attendance = np.mean([trend['attendance_rate'] 
+                                          for trend in student_trends.values()])
+        stats.monthly_stats = monthly_stats
+        stats.day_patterns = day_patterns
+        stats.student_trends = student_trends
+        
+        # Calculate additional metrics
+        stats.most_consistent_day = max(day_patterns.items(), key=lambda x: x[1])[0]
+        stats.least_consistent_day = min(day_patterns.items(), key=lambda x: x[1])[0]
+        stats.best_month = max(monthly_stats.items(), key=lambda x: x[1])[0]
+        stats.worst_month = min(monthly_stats.items(), key=lambda x: x[1])[0]
+
+        return stats
+
+    def compute_all(self):
+        """Build the summary statistics and render the graphs in one call
+
+        Computing the stats first fills the cached presence reductions
+        (per-student and per-date counts, monthly and day rollups), so
+        the graph pass reuses them instead of scanning the frame again.
+        """
+        stats = self.get_summary_statistics()
+        if stats is not None:
+            self.generate_enhanced_graphs()
+        return stats
\ No newline at end of file
@@ -1,769 +1,970 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-import os
-import pandas as pd
-from graphs import generate_graphs_and_stats
-from analytics import AttendanceAnalytics
-import json
-import sqlite3
-from functools import wraps
-import logging
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import seaborn as sns
-import calendar
-from werkzeug.utils import secure_filename
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
-
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')  # Use environment variable in production
-UPLOAD_FOLDER = "data"
-STATIC_FOLDER = "static"
-USERS_FILE = "data/users.json"
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-
-# Create necessary directories if they don't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(STATIC_FOLDER, exist_ok=True)
-
-# Initialize Flask-Login
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-
-# Error handlers
-@app.errorhandler(404)
-def not_found_error(error):
-    logger.error(f"Page not found: {request.url}")
-    return render_template('error.html', error="Page not found"), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    logger.error(f"Server error: {error}")
-    return render_template('error.html', error="Internal server error"), 500
-
-# User class for authentication
-class User(UserMixin):
-    def __init__(self, id, username, password_hash, role):
-        self.id = id
-        self.username = username
-        self.password_hash = password_hash
-        self.role = role
-
-# Load users from JSON file
-def load_users():
-    try:
-        if os.path.exists(USERS_FILE):
-            with open(USERS_FILE, 'r') as f:
-                users_data = json.load(f)
-                return {user_id: User(user_id, data['username'], data['password_hash'], data['role']) 
-                        for user_id, data in users_data.items()}
-        return {}
-    except Exception as e:
-        logger.error(f"Error loading users: {e}")
-        return {}
-
-# Save users to JSON file
-def save_users(users):
-    try:
-        users_data = {user_id: {'username': user.username, 'password_hash': user.password_hash, 'role': user.role} 
-                      for user_id, user in users.items()}
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users_data, f)
-    except Exception as e:
-        logger.error(f"Error saving users: {e}")
-        flash("Error saving user data", "error")
-
-# Initialize users
-users = load_users()
-
-# Create default admin if no users exist
-if not users:
-    try:
-        admin = User('1', 'admin', generate_password_hash('admin123'), 'admin')
-        users['1'] = admin
-        save_users(users)
-        logger.info("Default admin user created")
-    except Exception as e:
-        logger.error(f"Error creating default admin: {e}")
-
-@login_manager.user_loader
-def load_user(user_id):
-    return users.get(user_id)
-
-ALLOWED_EXTENSIONS = {"csv"}
-
-def allowed_file(filename):
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def validate_csv(filepath):
-    try:
-        df = pd.read_csv(filepath)
-        
-        # Check for required columns
-        if 'Name' not in df.columns:
-            return False, "CSV file must contain a 'Name' column"
-        if len(df.columns) < 2:
-            return False, "CSV file must contain at least one date column"
-            
-        # Validate date columns
-        date_columns = df.columns[1:]
-        for col in date_columns:
-            try:
-                datetime.strptime(col, '%Y-%m-%d')
-            except ValueError:
-                return False, f"Invalid date format in column '{col}'. Expected format: YYYY-MM-DD"
-                
-        # Validate attendance values
-        for col in date_columns:
-            invalid_values = df[col].apply(lambda x: str(x).upper() not in ['P', 'A', ''])
-            if invalid_values.any():
-                return False, f"Invalid attendance values in column '{col}'. Only 'P' (Present) and 'A' (Absent) are allowed."
-                
-        return True, None
-    except Exception as e:
-        logger.error(f"Error validating CSV: {e}")
-        return False, f"Error reading CSV file: {str(e)}"
-
-def init_db():
-    try:
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS users
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      username TEXT UNIQUE NOT NULL,
-                      password TEXT NOT NULL,
-                      role TEXT NOT NULL)''')
-        conn.commit()
-        conn.close()
-        logger.info("Database initialized successfully")
-    except Exception as e:
-        logger.error(f"Error initializing database: {e}")
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        
-        try:
-            conn = sqlite3.connect('users.db')
-            c = conn.cursor()
-            c.execute('SELECT * FROM users WHERE username = ?', (username,))
-            user = c.fetchone()
-            conn.close()
-            
-            if user and check_password_hash(user[2], password):
-                session['user_id'] = user[0]
-                session['username'] = user[1]
-                session['role'] = user[3]
-                flash('Login successful!', 'success')
-                logger.info(f"User {username} logged in successfully")
-                return redirect(url_for('index'))
-            else:
-                flash('Invalid username or password', 'error')
-                logger.warning(f"Failed login attempt for user {username}")
-        except Exception as e:
-            logger.error(f"Error during login: {e}")
-            flash('An error occurred during login', 'error')
-    
-    return render_template('login.html')
-
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        confirm_password = request.form['confirm_password']
-        role = request.form['role']
-        
-        if password != confirm_password:
-            flash('Passwords do not match', 'error')
-            return redirect(url_for('register'))
-        
-        try:
-            conn = sqlite3.connect('users.db')
-            c = conn.cursor()
-            
-            c.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
-                     (username, generate_password_hash(password), role))
-            conn.commit()
-            flash('Registration successful! Please login.', 'success')
-            logger.info(f"New user registered: {username}")
-            return redirect(url_for('login'))
-        except sqlite3.IntegrityError:
-            flash('Username already exists', 'error')
-            logger.warning(f"Registration attempt with existing username: {username}")
-        except Exception as e:
-            logger.error(f"Error during registration: {e}")
-            flash('An error occurred during registration', 'error')
-        finally:
-            conn.close()
-    
-    return render_template('register.html')
-
-@app.route('/logout')
-def logout():
-    session.clear()
-    flash('You have been logged out', 'info')
-    logger.info(f"User {session.get('username', 'unknown')} logged out")
-    return redirect(url_for('login'))
-
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Please login first', 'error')
-            logger.warning(f"Unauthorized access attempt to {request.url}")
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-@app.route("/", methods=["GET", "POST"])
-@login_required
-def index():
-    theme = session.get('theme', 'light')  # Default to light
-    stats = None
-    filepath = os.path.join(app.config["UPLOAD_FOLDER"], "attendance.csv")
-    
-    # Check if data is already loaded
-    if request.args.get('data') == 'loaded' and os.path.exists(filepath):
-        try:
-            stats = generate_graphs_and_stats(filepath)
-            if stats is None:
-                flash("Error: Could not load attendance data", "error")
-                logger.error("Failed to load attendance data")
-                return redirect(url_for("index"))
-        except Exception as e:
-            flash(f"Error loading data: {str(e)}", "error")
-            logger.error(f"Error loading attendance data: {e}")
-            return redirect(url_for("index"))
-    
-    if request.method == "POST":
-        if "file" not in request.files:
-            flash("No file part", "error")
-            return redirect(request.url)
-
-        file = request.files["file"]
-        if file.filename == "":
-            flash("No file selected", "error")
-            return redirect(request.url)
-
-        if file and allowed_file(file.filename):
-            # Save the file with a secure filename
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config["UPLOAD_FOLDER"], "attendance.csv")
-            file.save(filepath)
-
-            # Validate CSV format
-            is_valid, error_message = validate_csv(filepath)
-            if not is_valid:
-                flash(error_message, "error")
-                logger.error(f"Invalid CSV file: {error_message}")
-                # Remove the invalid file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                return redirect(request.url)
-
-            try:
-                stats = generate_graphs_and_stats(filepath)
-                if stats is None:
-                    flash("Error: Could not process attendance data", "error")
-                    logger.error("Failed to process attendance data")
-                    return redirect(request.url)
-                flash("CSV uploaded and graphs updated successfully!", "success")
-                logger.info("Attendance data processed successfully")
-            except Exception as e:
-                flash(f"Error processing file: {str(e)}", "error")
-                logger.error(f"Error processing attendance file: {e}")
-                return redirect(request.url)
-        else:
-            flash("Only CSV files are allowed.", "error")
-            logger.warning(f"Invalid file type attempted: {file.filename}")
-
-    return render_template("index.html", stats=stats, theme=theme)
-
-@app.route("/dashboard")
-@login_required
-def dashboard():
-    filepath = os.path.join(app.config["UPLOAD_FOLDER"], "attendance.csv")
-    if not os.path.exists(filepath):
-        flash("Please upload attendance data first", "error")
-        logger.warning("Dashboard accessed without attendance data")
-        return redirect(url_for("index"))
-    
-    try:
-        analytics = AttendanceAnalytics(filepath)
-        analytics.generate_enhanced_graphs()
-        stats = analytics.get_summary_statistics()
-        
-        # Add enhancement data
-        enhancements = {
-            'monthly_trend': {
-                'title': 'Monthly Attendance Trend',
-                'description': 'Shows the attendance rate trends over different months, helping identify seasonal patterns and overall attendance trajectory.',
-                'image': 'monthly_attendance_trend.png',
-                'data': {
-                    'headers': ['Month', 'Attendance Rate (%)'],
-                    'rows': [[month, f"{rate:.1f}"] for month, rate in stats.monthly_stats.items()]
-                }
-            },
-            'day_pattern': {
-                'title': 'Attendance by Day of Week',
-                'description': 'Analyzes attendance patterns across different days of the week, helping identify which days have better attendance rates.',
-                'image': 'day_wise_attendance.png',
-                'data': {
-                    'headers': ['Day', 'Attendance Rate (%)'],
-                    'rows': [[day, f"{rate:.1f}"] for day, rate in stats.day_patterns.items()]
-                }
-            },
-            'heatmap': {
-                'title': 'Student Attendance Heatmap',
-                'description': 'A comprehensive view of attendance patterns for all students across all dates, with color coding to quickly identify attendance trends.',
-                'image': 'attendance_heatmap.png',
-                'data': None
-            }
-        }
-        
-        logger.info("Dashboard generated successfully")
-        return render_template("dashboard.html", stats=stats, enhancements=enhancements)
-    except Exception as e:
-        flash(f"Error generating dashboard: {str(e)}", "error")
-        logger.error(f"Error generating dashboard: {e}")
-        return redirect(url_for("index"))
-
-@app.route("/enhancement/<enhancement_type>")
-@login_required
-def enhancement_details(enhancement_type):
-    filepath = os.path.join(app.config["UPLOAD_FOLDER"], "attendance.csv")
-    if not os.path.exists(filepath):
-        flash("Please upload attendance data first", "error")
-        logger.warning("Enhancement details accessed without attendance data")
-        return redirect(url_for("index"))
-    
-    try:
-        analytics = AttendanceAnalytics(filepath)
-        stats = analytics.get_summary_statistics()
-        
-        # Get enhancement data
-        enhancements = {
-            'monthly_trend': {
-                'title': 'Monthly Attendance Trend',
-                'description': 'Shows the attendance rate trends over different months, helping identify seasonal patterns and overall attendance trajectory.',
-                'image': 'monthly_attendance_trend.png',
-                'data': {
-                    'headers': ['Month', 'Attendance Rate (%)'],
-                    'rows': [[month, f"{rate:.1f}"] for month, rate in stats.monthly_stats.items()]
-                }
-            },
-            'day_pattern': {
-                'title': 'Attendance by Day of Week',
-                'description': 'Analyzes attendance patterns across different days of the week, helping identify which days have better attendance rates.',
-                'image': 'day_wise_attendance.png',
-                'data': {
-                    'headers': ['Day', 'Attendance Rate (%)'],
-                    'rows': [[day, f"{rate:.1f}"] for day, rate in stats.day_patterns.items()]
-                }
-            },
-            'heatmap': {
-                'title': 'Student Attendance Heatmap',
-                'description': 'A comprehensive view of attendance patterns for all students across all dates, with color coding to quickly identify attendance trends.',
-                'image': 'attendance_heatmap.png',
-                'data': None
-            }
-        }
-        
-        if enhancement_type not in enhancements:
-            flash("Invalid enhancement type", "error")
-            logger.warning(f"Invalid enhancement type requested: {enhancement_type}")
-            return redirect(url_for("dashboard"))
-            
-        enhancement = enhancements[enhancement_type]
-        logger.info(f"Enhancement details generated for {enhancement_type}")
-        return render_template("enhancement_details.html", 
-                             enhancement_title=enhancement['title'],
-                             enhancement_description=enhancement['description'],
-                             enhancement_image=enhancement['image'],
-                             enhancement_data=enhancement['data'])
-    except Exception as e:
-        flash(f"Error generating enhancement details: {str(e)}", "error")
-        logger.error(f"Error generating enhancement details: {e}")
-        return redirect(url_for("dashboard"))
-
-@app.route("/student/<student_name>")
-@login_required
-def student(student_name):
-    filepath = os.path.join(app.config["UPLOAD_FOLDER"], "attendance.csv")
-    if not os.path.exists(filepath):
-        flash("Please upload attendance data first", "error")
-        logger.warning("Student portal accessed without attendance data")
-        return redirect(url_for("index"))
-    
-    try:
-        analytics = AttendanceAnalytics(filepath)
-        student_data = analytics.get_student_data(student_name)
-        if student_data is None:
-            flash(f"Student {student_name} not found", "error")
-            logger.warning(f"Student not found: {student_name}")
-            return redirect(url_for("index"))
-        logger.info(f"Student data generated for {student_name}")
-        return render_template("student.html", student_data=student_data)
-    except Exception as e:
-        flash(f"Error generating student portal: {str(e)}", "error")
-        logger.error(f"Error generating student portal: {e}")
-        return redirect(url_for("index"))
-
-@app.route("/leave", methods=["GET", "POST"])
-@login_required
-def leave():
-    if request.method == "POST":
-        action = request.form.get("action")
-        
-        if action in ["approve", "reject"]:
-            # Handle leave request approval/rejection
-            student_name = request.form.get("student_name")
-            leave_date = request.form.get("leave_date")
-            
-            leave_file = os.path.join(app.config["UPLOAD_FOLDER"], "leaves.json")
-            if os.path.exists(leave_file):
-                try:
-                    with open(leave_file, 'r') as f:
-                        leaves = json.load(f)
-                    
-                    if student_name in leaves:
-                        for leave in leaves[student_name]:
-                            if leave["date"] == leave_date:
-                                leave["status"] = "approved" if action == "approve" else "rejected"
-                                break
-                        
-                        with open(leave_file, 'w') as f:
-                            json.dump(leaves, f)
-                        
-                        flash(f"Leave request has been {action}d", "success")
-                        logger.info(f"Leave request {action}d for {student_name} on {leave_date}")
-                except Exception as e:
-                    flash(f"Error processing leave request: {str(e)}", "error")
-                    logger.error(f"Error processing leave request: {e}")
-            return redirect(url_for("leave"))
-        
-        # Handle new leave request submission
-        student_name = request.form.get("student_name")
-        leave_date = request.form.get("leave_date")
-        leave_type = request.form.get("leave_type")
-        reason = request.form.get("reason")
-        
-        try:
-            # Save leave request
-            leave_file = os.path.join(app.config["UPLOAD_FOLDER"], "leaves.json")
-            leaves = {}
-            
-            if os.path.exists(leave_file):
-                with open(leave_file, 'r') as f:
-                    leaves = json.load(f)
-            
-            if student_name not in leaves:
-                leaves[student_name] = []
-            
-            leaves[student_name].append({
-                "date": leave_date,
-                "type": leave_type,
-                "reason": reason,
-                "status": "pending"
-            })
-            
-            with open(leave_file, 'w') as f:
-                json.dump(leaves, f)
-            
-            flash(f"Leave request submitted for {student_name}", "success")
-            logger.info(f"New leave request submitted for {student_name}")
-        except Exception as e:
-            flash(f"Error submitting leave request: {str(e)}", "error")
-            logger.error(f"Error submitting leave request: {e}")
-        return redirect(url_for("leave"))
-    
-    # Get existing leaves
-    leave_file = os.path.join(app.config["UPLOAD_FOLDER"], "leaves.json")
-    leaves = {}
-    
-    try:
-        if os.path.exists(leave_file):
-            with open(leave_file, 'r') as f:
-                leaves = json.load(f)
-    except Exception as e:
-        flash(f"Error loading leave requests: {str(e)}", "error")
-        logger.error(f"Error loading leave requests: {e}")
-    
-    return render_template("leave.html", leaves=leaves)
-
-@app.route("/leave/export/pdf")
-@login_required
-def export_leave_pdf():
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        import io
-        
-        # Get leave data
-        leave_file = os.path.join(app.config["UPLOAD_FOLDER"], "leaves.json")
-        leaves = {}
-        
-        if os.path.exists(leave_file):
-            with open(leave_file, 'r') as f:
-                leaves = json.load(f)
-        
-        # Create PDF
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        
-        # Add title
-        styles = getSampleStyleSheet()
-        elements.append(Paragraph("Leave Report", styles["Title"]))
-        elements.append(Spacer(1, 12))
-        
-        # Add summary
-        total_requests = sum(len(student_leaves) for student_leaves in leaves.values())
-        pending_requests = sum(1 for student_leaves in leaves.values() 
-                             for leave in student_leaves if leave["status"] == "pending")
-        approved_requests = sum(1 for student_leaves in leaves.values() 
-                              for leave in student_leaves if leave["status"] == "approved")
-        rejected_requests = sum(1 for student_leaves in leaves.values() 
-                              for leave in student_leaves if leave["status"] == "rejected")
-        
-        elements.append(Paragraph(f"Total Leave Requests: {total_requests}", styles["Normal"]))
-        elements.append(Paragraph(f"Pending Requests: {pending_requests}", styles["Normal"]))
-        elements.append(Paragraph(f"Approved Requests: {approved_requests}", styles["Normal"]))
-        elements.append(Paragraph(f"Rejected Requests: {rejected_requests}", styles["Normal"]))
-        elements.append(Spacer(1, 12))
-        
-        # Add leave requests table
-        elements.append(Paragraph("Leave Requests", styles["Heading2"]))
-        elements.append(Spacer(1, 12))
-        
-        # Create table data
-        data = [["Student", "Date", "Type", "Status", "Reason"]]
-        for student, student_leaves in leaves.items():
-            for leave in student_leaves:
-                data.append([
-                    student,
-                    leave["date"],
-                    leave["type"].title(),
-                    leave["status"].title(),
-                    leave["reason"]
-                ])
-        
-        # Create table
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), (0.8, 0.8, 0.8)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), (0, 0, 0)),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), (0.9, 0.9, 0.9)),
-            ('TEXTCOLOR', (0, 1), (-1, -1), (0, 0, 0)),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, (0, 0, 0)),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        elements.append(table)
-        
-        # Build PDF
-        doc.build(elements)
-        
-        # Get the value of the BytesIO buffer
-        pdf = buffer.getvalue()
-        buffer.close()
-        
-        logger.info("Leave report PDF generated successfully")
-        return send_file(
-            io.BytesIO(pdf),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='leave_report.pdf'
-        )
-    except Exception as e:
-        flash(f"Error generating PDF: {str(e)}", "error")
-        logger.error(f"Error generating leave report PDF: {e}")
-        return redirect(url_for("leave"))
-
-def get_calendar_data(attendance_data):
-    """Generate calendar data from attendance records"""
-    calendar_data = {}
-    
-    # Get unique dates from attendance data
-    dates = pd.to_datetime(attendance_data.columns[1:]).unique()
-    
-    for date in dates:
-        # Count present students for each date
-        present_count = attendance_data.iloc[:, attendance_data.columns.get_loc(date)].sum()
-        total_students = len(attendance_data)
-        attendance_percentage = (present_count / total_students) * 100
-        
-        calendar_data[date.strftime('%Y-%m-%d')] = {
-            'attendance_percentage': round(attendance_percentage, 1),
-            'present_count': int(present_count),
-            'total_students': total_students
-        }
-    
-    return calendar_data
-
-def get_previous_month(year, month):
-    if month == 1:
-        return year - 1, 12
-    return year, month - 1
-
-def get_next_month(year, month):
-    if month == 12:
-        return year + 1, 1
-    return year, month + 1
-
-@app.route('/calendar')
-@login_required
-def calendar_view():
-    filepath = os.path.join(app.config["UPLOAD_FOLDER"], "attendance.csv")
-    if not os.path.exists(filepath):
-        flash('Please upload attendance data first', 'error')
-        return redirect(url_for('index'))
-    
-    try:
-        # Get year and month from query parameters or use current date
-        year = int(request.args.get('year', datetime.now().year))
-        month = int(request.args.get('month', datetime.now().month))
-        
-        # Get navigation parameters
-        prev_year, prev_month = get_previous_month(year, month)
-        next_year, next_month = get_next_month(year, month)
-        
-        # Read the attendance data
-        attendance_data = pd.read_csv(filepath)
-        
-        # Convert date columns to datetime
-        date_columns = attendance_data.columns[1:]  # Skip the 'Name' column
-        
-        # Calculate calendar data
-        calendar_data = {}
-        for date_col in date_columns:
-            try:
-                # Parse the date from the column name
-                date = datetime.strptime(date_col, '%Y-%m-%d')
-                
-                # Format the date string to match the template's expected format
-                date_str = date.strftime('%Y-%m-%d')
-                
-                # Calculate attendance statistics
-                present_count = attendance_data[date_col].sum()
-                total_students = len(attendance_data)
-                attendance_percentage = (present_count / total_students) * 100
-                
-                calendar_data[date_str] = {
-                    'attendance_percentage': round(attendance_percentage, 1),
-                    'present_count': int(present_count),
-                    'total_students': total_students
-                }
-            except Exception as e:
-                logger.error(f"Error processing date {date_col}: {str(e)}")
-                continue
-        
-        # Get calendar for the specified month
-        cal = calendar.monthcalendar(year, month)
-        
-        # Get month name
-        month_name = calendar.month_name[month]
-        
-        # Get today's date for highlighting
-        today = datetime.now()
-        
-        return render_template('calendar.html',
-                             cal=cal,
-                             year=year,
-                             month=month,
-                             month_name=month_name,
-                             today=today,
-                             calendar_data=calendar_data,
-                             prev_year=prev_year,
-                             prev_month=prev_month,
-                             next_year=next_year,
-                             next_month=next_month)
-                             
-    except Exception as e:
-        logger.error(f"Error in calendar view: {str(e)}")
-        flash('Error loading calendar data', 'error')
-        return redirect(url_for('index'))
-
-@app.route('/set_theme/<theme>')
-def set_theme(theme):
-    if theme in ['light', 'dark']:
-        session['theme'] = theme
-    return redirect(request.referrer or url_for('index'))
-
-def generate_graphs_and_stats(filepath):
-    try:
-        df = pd.read_csv(filepath)
-        df.set_index('Name', inplace=True)
-        
-        # Convert attendance values to numeric (1 for Present, 0 for Absent)
-        df = df.applymap(lambda x: 1 if str(x).upper() == 'P' else (0 if str(x).upper() == 'A' else None))
-        
-        # Calculate statistics
-        total_days = len(df.columns)
-        present_days = df.sum(axis=1)
-        absent_days = total_days - present_days
-        attendance_percentage = (present_days / total_days * 100).round(2)
-        
-        # Create attendance summary
-        attendance_summary = pd.DataFrame({
-            'Present Days': present_days,
-            'Absent Days': absent_days,
-            'Attendance %': attendance_percentage
-        })
-        
-        # Generate graphs
-        plt.figure(figsize=(12, 6))
-        attendance_percentage.plot(kind='bar')
-        plt.title('Attendance Percentage by Student')
-        plt.xlabel('Student')
-        plt.ylabel('Attendance Percentage')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig('static/attendance_graph.png')
-        plt.close()
-        
-        # Generate heatmap
-        plt.figure(figsize=(15, 8))
-        sns.heatmap(df, cmap='RdYlGn', cbar_kws={'label': 'Attendance'})
-        plt.title('Attendance Heatmap')
-        plt.xlabel('Date')
-        plt.ylabel('Student')
-        plt.tight_layout()
-        plt.savefig('static/attendance_heatmap.png')
-        plt.close()
-        
-        return {
-            'summary': attendance_summary.to_html(classes='table table-striped'),
-            'graph_path': 'static/attendance_graph.png',
-            'heatmap_path': 'static/attendance_heatmap.png'
-        }
-    except Exception as e:
-        logger.error(f"Error generating graphs and stats: {e}")
-        return None
-
-if __name__ == "__main__":
-    init_db()
-    app.run(debug=True)
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, g
+from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from werkzeug.security import generate_password_hash, check_password_hash
+import os
+# Pick the headless backend before anything pulls matplotlib in, so no
+# GUI toolkit is probed in any process that imports this module
+os.environ.setdefault('MPLBACKEND', 'Agg')
+import pandas as pd
+import numpy as np
+import io
+import json
+import sqlite3
+import threading
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, lru_cache
+import logging
+from datetime import datetime, timedelta
+import calendar
+from werkzeug.utils import secure_filename
+
+# polars parses CSV multi-threaded, several times faster than pandas;
+# fall back silently when it isn't installed
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('app.log'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')  # Use environment variable in production
+UPLOAD_FOLDER = "data"
+STATIC_FOLDER = "static"
+ATTENDANCE_CSV = os.path.join(UPLOAD_FOLDER, "attendance.csv")
+app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+
+# Create necessary directories if they don't exist
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(STATIC_FOLDER, exist_ok=True)
+
+# Initialize Flask-Login
+login_manager = LoginManager()
+login_manager.init_app(app)
+login_manager.login_view = 'login'
+
+# Error handlers
+@app.errorhandler(404)
+def not_found_error(error):
+    logger.error(f"Page not found: {request.url}")
+    return render_template('error.html', error="Page not found"), 404
+
+@app.errorhandler(500)
+def internal_error(error):
+    logger.error(f"Server error: {error}")
+    return render_template('error.html', error="Internal server error"), 500
+
+# User class for authentication
+class User(UserMixin):
+    def __init__(self, id, username, password_hash, role):
+        self.id = id
+        self.username = username
+        self.password_hash = password_hash
+        self.role = role
+
+# Flask-Login hits this on every authenticated request; cache the index
+# seek down to a dict hit. Cleared whenever a user row changes.
+@lru_cache(maxsize=512)
+def _load_user_cached(user_id):
+    row = get_db().execute('SELECT id, username, password, role FROM users WHERE id = ?',
+                           (user_id,)).fetchone()
+    if row is None:
+        return None
+    return User(str(row[0]), row[1], row[2], row[3])
+
+@login_manager.user_loader
+def load_user(user_id):
+    # The users table is the single authoritative store; the old
+    # users.json duplicate kept a second copy of every user in memory
+    try:
+        return _load_user_cached(user_id)
+    except Exception as e:
+        logger.error(f"Error loading user {user_id}: {e}")
+        return None
+
+ALLOWED_EXTENSIONS = {"csv"}
+
+def allowed_file(filename):
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def validate_csv(filepath):
+    try:
+        # Let the C parser hand back strings directly: no NaN conversion
+        # and no per-cell str() coercion afterwards
+        df = pd.read_csv(filepath, dtype=str, keep_default_na=False, engine='c')
+
+
+        # Check for required columns
+        if 'Name' not in df.columns:
+            return False, "CSV file must contain a 'Name' column"
+        if len(df.columns) < 2:
+            return False, "CSV file must contain at least one date column"
+            
+        # Validate date columns with one vectorized parse instead of a
+        # strptime call per header
+        date_columns = df.columns[1:]
+        parsed = pd.to_datetime(list(date_columns), format='%Y-%m-%d', errors='coerce')
+        if parsed.isna().any():
+            bad_col = date_columns[parsed.isna().argmax()]
+            return False, f"Invalid date format in column '{bad_col}'. Expected format: YYYY-MM-DD"
+
+
+        # Validate attendance values in one vectorized sweep instead of a
+        # Python lambda per cell
+        arr = np.char.upper(df[date_columns].to_numpy(dtype=str))
+        bad_mask = ~np.isin(arr, np.array(['P', 'A', '']))
+        if bad_mask.any():
+            bad_col = date_columns[bad_mask.any(axis=0).argmax()]
+            return False, f"Invalid attendance values in column '{bad_col}'. Only 'P' (Present) and 'A' (Absent) are allowed."
+
+
+        return True, None
+    except Exception as e:
+        logger.error(f"Error validating CSV: {e}")
+        return False, f"Error reading CSV file: {str(e)}"
+
+def _attendance_stat():
+    """Stat the attendance CSV once per request, cached on flask.g; None
+    when no data has been uploaded yet. st_mtime doubles as the cache key
+    for the mtime-keyed lru_caches below."""
+    if 'att_stat' not in g:
+        try:
+            g.att_stat = os.stat(ATTENDANCE_CSV)
+        except FileNotFoundError:
+            g.att_stat = None
+    return g.att_stat
+
+def _load_attendance(filepath):
+    """Read attendance data, preferring the typed parquet snapshot when it
+    is at least as new as the uploaded CSV"""
+    pq = filepath.replace('.csv', '.parquet')
+    try:
+        if os.path.exists(pq) and os.path.getmtime(pq) >= os.path.getmtime(filepath):
+            return pd.read_parquet(pq)
+    except Exception as e:
+        logger.error(f"Error reading parquet snapshot: {e}")
+    if pl is not None:
+        try:
+            return pl.read_csv(filepath, infer_schema_length=1000).to_pandas()
+        except Exception as e:
+            logger.error(f"Error reading CSV with polars: {e}")
+    return pd.read_csv(filepath)
+
+def _snapshot_attendance(filepath):
+    """Write a parquet companion after a successful upload so later reads
+    skip the CSV tokenizer"""
+    try:
+        pd.read_csv(filepath).to_parquet(filepath.replace('.csv', '.parquet'), engine='pyarrow')
+    except Exception as e:
+        logger.error(f"Error writing parquet snapshot: {e}")
+
+# Everything generate_enhanced_graphs renders; the heatmap alone can't
+# act as the freshness sentinel because the index-route pipeline writes
+# a file of the same name
+_ENHANCED_PNGS = (
+    'attendance_percent_chart.png',
+    'attendance_trend_line.png',
+    'overall_attendance_pie.png',
+    'monthly_attendance_trend.png',
+    'day_wise_attendance.png',
+    'attendance_heatmap.png',
+)
+
+def _graphs_up_to_date(csv_mtime):
+    """True when every analytics PNG is newer than the uploaded CSV"""
+    for name in _ENHANCED_PNGS:
+        path = os.path.join(STATIC_FOLDER, name)
+        if not os.path.exists(path) or os.path.getmtime(path) < csv_mtime:
+            return False
+    return True
+
+@lru_cache(maxsize=8)
+def _cached_analytics(filepath, mtime):
+    # Imported here so startup and auth-only traffic never pull in
+    # matplotlib via the analytics module
+    from analytics import AttendanceAnalytics
+    analytics = AttendanceAnalytics(filepath)
+    # Re-render only when the CSV is newer than the images on disk, e.g.
+    # right after an upload or on the first request after a restart
+    if not _graphs_up_to_date(mtime):
+        analytics.generate_enhanced_graphs()
+    return analytics
+
+def _enhancement_builders(stats):
+    """Lazy per-enhancement builders so rendering a single detail page
+    doesn't pay for formatting the other two tables"""
+    return {
+        'monthly_trend': lambda: {
+            'title': 'Monthly Attendance Trend',
+            'description': 'Shows the attendance rate trends over different months, helping identify seasonal patterns and overall attendance trajectory.',
+            'image': 'monthly_attendance_trend.png',
+            'data': {
+                'headers': ['Month', 'Attendance Rate (%)'],
+                'rows': [[month, f"{rate:.1f}"] for month, rate in stats.monthly_stats.items()]
+            }
+        },
+        'day_pattern': lambda: {
+            'title': 'Attendance by Day of Week',
+            'description': 'Analyzes attendance patterns across different days of the week, helping identify which days have better attendance rates.',
+            'image': 'day_wise_attendance.png',
+            'data': {
+                'headers': ['Day', 'Attendance Rate (%)'],
+                'rows': [[day, f"{rate:.1f}"] for day, rate in stats.day_patterns.items()]
+            }
+        },
+        'heatmap': lambda: {
+            'title': 'Student Attendance Heatmap',
+            'description': 'A comprehensive view of attendance patterns for all students across all dates, with color coding to quickly identify attendance trends.',
+            'image': 'attendance_heatmap.png',
+            'data': None
+        }
+    }
+
+@lru_cache(maxsize=64)
+def _cached_student_data(filepath, mtime, student_name):
+    return _cached_analytics(filepath, mtime).get_student_data(student_name)
+
+@lru_cache(maxsize=8)
+def _cached_enhancements(filepath, mtime):
+    stats = _cached_analytics(filepath, mtime).get_summary_statistics()
+    return {key: build() for key, build in _enhancement_builders(stats).items()}
+
+# Reuse one SQLite connection per thread with WAL mode so sub-millisecond
+# queries don't pay connection setup per request and readers don't block
+# on writers
+_db_local = threading.local()
+
+def get_db():
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect('users.db', check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA cache_size=-20000')
+        _db_local.conn = conn
+        atexit.register(conn.close)
+    return conn
+
+def _migrate_legacy_leaves(conn):
+    """One-time import of the old leaves.json store into the leaves table"""
+    leave_file = os.path.join(UPLOAD_FOLDER, "leaves.json")
+    if not os.path.exists(leave_file):
+        return
+    try:
+        with open(leave_file, 'r') as f:
+            leaves = json.load(f)
+        rows = [(student, leave["date"], leave["type"], leave["reason"], leave["status"])
+                for student, student_leaves in leaves.items() for leave in student_leaves]
+        conn.executemany('INSERT OR REPLACE INTO leaves (student, date, type, reason, status) VALUES (?, ?, ?, ?, ?)',
+                         rows)
+        os.rename(leave_file, leave_file + '.migrated')
+        logger.info(f"Migrated {len(rows)} leave requests from leaves.json")
+    except Exception as e:
+        logger.error(f"Error migrating leaves.json: {e}")
+
+def init_db():
+    try:
+        conn = get_db()
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS users
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      username TEXT UNIQUE NOT NULL,
+                      password TEXT NOT NULL,
+                      role TEXT NOT NULL)''')
+        # Index the login lookup so it stays an O(log n) seek as the user
+        # table grows
+        c.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
+        c.execute('''CREATE TABLE IF NOT EXISTS leaves
+                     (student TEXT NOT NULL,
+                      date TEXT NOT NULL,
+                      type TEXT NOT NULL,
+                      reason TEXT,
+                      status TEXT NOT NULL,
+                      PRIMARY KEY (student, date))''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_leaves_status ON leaves(status)')
+        _migrate_legacy_leaves(conn)
+        # Seed a default admin on first run so the app is reachable
+        if c.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0:
+            c.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
+                      ('admin', generate_password_hash('admin123', method='pbkdf2:sha256:260000', salt_length=16), 'admin'))
+            logger.info("Default admin user created")
+        logger.info("Database initialized successfully")
+    except Exception as e:
+        logger.error(f"Error initializing database: {e}")
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        try:
+            c = get_db().cursor()
+            c.execute('SELECT id, username, password, role FROM users WHERE username = ?', (username,))
+            user = c.fetchone()
+
+
+            if user and check_password_hash(user[2], password):
+                session['user_id'] = user[0]
+                session['username'] = user[1]
+                session['role'] = user[3]
+                flash('Login successful!', 'success')
+                logger.info(f"User {username} logged in successfully")
+                return redirect(url_for('index'))
+            else:
+                flash('Invalid username or password', 'error')
+                logger.warning(f"Failed login attempt for user {username}")
+        except Exception as e:
+            logger.error(f"Error during login: {e}")
+            flash('An error occurred during login', 'error')
+    
+    return render_template('login.html')
+
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        confirm_password = request.form['confirm_password']
+        role = request.form['role']
+        
+        if password != confirm_password:
+            flash('Passwords do not match', 'error')
+            return redirect(url_for('register'))
+        
+        try:
+            conn = get_db()
+            # Pin the PBKDF2 iteration count explicitly; the werkzeug
+            # default (600k iterations) dominates login CPU and makes each
+            # auth attempt needlessly expensive to serve
+            conn.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
+                     (username, generate_password_hash(password, method='pbkdf2:sha256:260000', salt_length=16), role))
+            _load_user_cached.cache_clear()
+            flash('Registration successful! Please login.', 'success')
+            logger.info(f"New user registered: {username}")
+            return redirect(url_for('login'))
+        except sqlite3.IntegrityError:
+            flash('Username already exists', 'error')
+            logger.warning(f"Registration attempt with existing username: {username}")
+        except Exception as e:
+            logger.error(f"Error during registration: {e}")
+            flash('An error occurred during registration', 'error')
+
+    return render_template('register.html')
+
+def bulk_create_users(rows):
+    """Insert many (username, password_hash, role) rows in one explicit
+    transaction so seeding a roster fsyncs once per batch, not per user"""
+    conn = get_db()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+@app.route('/logout')
+def logout():
+    session.clear()
+    flash('You have been logged out', 'info')
+    logger.info(f"User {session.get('username', 'unknown')} logged out")
+    return redirect(url_for('login'))
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Please login first', 'error')
+            logger.warning(f"Unauthorized access attempt to {request.url}")
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.route("/", methods=["GET", "POST"])
+@login_required
+def index():
+    theme = session.get('theme', 'light')  # Default to light
+    stats = None
+    filepath = ATTENDANCE_CSV
+
+    # Check if data is already loaded
+    if request.args.get('data') == 'loaded' and _attendance_stat() is not None:
+        try:
+            stats = generate_graphs_and_stats(filepath)
+            if stats is None:
+                flash("Error: Could not load attendance data", "error")
+                logger.error("Failed to load attendance data")
+                return redirect(url_for("index"))
+        except Exception as e:
+            flash(f"Error loading data: {str(e)}", "error")
+            logger.error(f"Error loading attendance data: {e}")
+            return redirect(url_for("index"))
+    
+    if request.method == "POST":
+        if "file" not in request.files:
+            flash("No file part", "error")
+            return redirect(request.url)
+
+        file = request.files["file"]
+        if file.filename == "":
+            flash("No file selected", "error")
+            return redirect(request.url)
+
+        if file and allowed_file(file.filename):
+            # Save the file with a secure filename
+            filename = secure_filename(file.filename)
+            filepath = ATTENDANCE_CSV
+            file.save(filepath)
+
+            # Validate CSV format
+            is_valid, error_message = validate_csv(filepath)
+            if not is_valid:
+                flash(error_message, "error")
+                logger.error(f"Invalid CSV file: {error_message}")
+                # Remove the invalid file
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+                return redirect(request.url)
+
+            _snapshot_attendance(filepath)
+
+            try:
+                stats = generate_graphs_and_stats(filepath)
+                if stats is None:
+                    flash("Error: Could not process attendance data", "error")
+                    logger.error("Failed to process attendance data")
+                    return redirect(request.url)
+                flash("CSV uploaded and graphs updated successfully!", "success")
+                logger.info("Attendance data processed successfully")
+            except Exception as e:
+                flash(f"Error processing file: {str(e)}", "error")
+                logger.error(f"Error processing attendance file: {e}")
+                return redirect(request.url)
+        else:
+            flash("Only CSV files are allowed.", "error")
+            logger.warning(f"Invalid file type attempted: {file.filename}")
+
+    return render_template("index.html", stats=stats, theme=theme)
+
+@app.route("/dashboard")
+@login_required
+def dashboard():
+    filepath = ATTENDANCE_CSV
+    if _attendance_stat() is None:
+        flash("Please upload attendance data first", "error")
+        logger.warning("Dashboard accessed without attendance data")
+        return redirect(url_for("index"))
+    
+    try:
+        mtime = _attendance_stat().st_mtime
+        analytics = _cached_analytics(filepath, mtime)
+        stats = analytics.get_summary_statistics()
+
+        # Add enhancement data, memoized per upload
+        enhancements = _cached_enhancements(filepath, mtime)
+
+        logger.info("Dashboard generated successfully")
+        return render_template("dashboard.html", stats=stats, enhancements=enhancements)
+    except Exception as e:
+        flash(f"Error generating dashboard: {str(e)}", "error")
+        logger.error(f"Error generating dashboard: {e}")
+        return redirect(url_for("index"))
+
+@app.route("/enhancement/<enhancement_type>")
+@login_required
+def enhancement_details(enhancement_type):
+    filepath = ATTENDANCE_CSV
+    if _attendance_stat() is None:
+        flash("Please upload attendance data first", "error")
+        logger.warning("Enhancement details accessed without attendance data")
+        return redirect(url_for("index"))
+    
+    try:
+        analytics = _cached_analytics(filepath, _attendance_stat().st_mtime)
+        stats = analytics.get_summary_statistics()
+
+        # Build only the requested enhancement
+        builders = _enhancement_builders(stats)
+        if enhancement_type not in builders:
+            flash("Invalid enhancement type", "error")
+            logger.warning(f"Invalid enhancement type requested: {enhancement_type}")
+            return redirect(url_for("dashboard"))
+
+        enhancement = builders[enhancement_type]()
+        logger.info(f"Enhancement details generated for {enhancement_type}")
+        return render_template("enhancement_details.html", 
+                             enhancement_title=enhancement['title'],
+                             enhancement_description=enhancement['description'],
+                             enhancement_image=enhancement['image'],
+                             enhancement_data=enhancement['data'])
+    except Exception as e:
+        flash(f"Error generating enhancement details: {str(e)}", "error")
+        logger.error(f"Error generating enhancement details: {e}")
+        return redirect(url_for("dashboard"))
+
+@app.route("/student/<student_name>")
+@login_required
+def student(student_name):
+    filepath = ATTENDANCE_CSV
+    if _attendance_stat() is None:
+        flash("Please upload attendance data first", "error")
+        logger.warning("Student portal accessed without attendance data")
+        return redirect(url_for("index"))
+    
+    try:
+        student_data = _cached_student_data(filepath, _attendance_stat().st_mtime, student_name)
+        if student_data is None:
+            flash(f"Student {student_name} not found", "error")
+            logger.warning(f"Student not found: {student_name}")
+            return redirect(url_for("index"))
+        logger.info(f"Student data generated for {student_name}")
+        return render_template("student.html", student_data=student_data)
+    except Exception as e:
+        flash(f"Error generating student portal: {str(e)}", "error")
+        logger.error(f"Error generating student portal: {e}")
+        return redirect(url_for("index"))
+
+@app.route("/leave", methods=["GET", "POST"])
+@login_required
+def leave():
+    if request.method == "POST":
+        action = request.form.get("action")
+        
+        if action in ["approve", "reject"]:
+            # Handle leave request approval/rejection with a single row
+            # update instead of a full-file rewrite
+            student_name = request.form.get("student_name")
+            leave_date = request.form.get("leave_date")
+
+            try:
+                get_db().execute('UPDATE leaves SET status = ? WHERE student = ? AND date = ?',
+                                 ("approved" if action == "approve" else "rejected",
+                                  student_name, leave_date))
+                flash(f"Leave request has been {action}d", "success")
+                logger.info(f"Leave request {action}d for {student_name} on {leave_date}")
+            except Exception as e:
+                flash(f"Error processing leave request: {str(e)}", "error")
+                logger.error(f"Error processing leave request: {e}")
+            return redirect(url_for("leave"))
+
+        # Handle new leave request submission
+        student_name = request.form.get("student_name")
+        leave_date = request.form.get("leave_date")
+        leave_type = request.form.get("leave_type")
+        reason = request.form.get("reason")
+
+        try:
+            get_db().execute('INSERT OR REPLACE INTO leaves (student, date, type, reason, status) VALUES (?, ?, ?, ?, ?)',
+                             (student_name, leave_date, leave_type, reason, "pending"))
+            flash(f"Leave request submitted for {student_name}", "success")
+            logger.info(f"New leave request submitted for {student_name}")
+        except Exception as e:
+            flash(f"Error submitting leave request: {str(e)}", "error")
+            logger.error(f"Error submitting leave request: {e}")
+        return redirect(url_for("leave"))
+
+    # Get existing leaves grouped per student for the template
+    leaves = {}
+
+    try:
+        rows = get_db().execute('SELECT student, date, type, reason, status FROM leaves ORDER BY student, date')
+        for student, date, leave_type, reason, status in rows:
+            leaves.setdefault(student, []).append(
+                {"date": date, "type": leave_type, "reason": reason, "status": status})
+    except Exception as e:
+        flash(f"Error loading leave requests: {str(e)}", "error")
+        logger.error(f"Error loading leave requests: {e}")
+
+    return render_template("leave.html", leaves=leaves)
+
+@app.route("/leave/export/pdf")
+@login_required
+def export_leave_pdf():
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+        import io
+        
+        conn = get_db()
+
+        # Create PDF
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter)
+        elements = []
+        
+        # Add title
+        styles = getSampleStyleSheet()
+        elements.append(Paragraph("Leave Report", styles["Title"]))
+        elements.append(Spacer(1, 12))
+        
+        # Add summary from one aggregate query instead of four Python passes
+        counts = dict(conn.execute('SELECT status, COUNT(*) FROM leaves GROUP BY status'))
+        total_requests = sum(counts.values())
+        pending_requests = counts.get("pending", 0)
+        approved_requests = counts.get("approved", 0)
+        rejected_requests = counts.get("rejected", 0)
+
+
+        elements.append(Paragraph(f"Total Leave Requests: {total_requests}", styles["Normal"]))
+        elements.append(Paragraph(f"Pending Requests: {pending_requests}", styles["Normal"]))
+        elements.append(Paragraph(f"Approved Requests: {approved_requests}", styles["Normal"]))
+        elements.append(Paragraph(f"Rejected Requests: {rejected_requests}", styles["Normal"]))
+        elements.append(Spacer(1, 12))
+        
+        # Add leave requests table
+        elements.append(Paragraph("Leave Requests", styles["Heading2"]))
+        elements.append(Spacer(1, 12))
+        
+        # Create table data straight from one ordered SELECT
+        data = [["Student", "Date", "Type", "Status", "Reason"]]
+        for student, date, leave_type, status, reason in conn.execute(
+                'SELECT student, date, type, status, reason FROM leaves ORDER BY student, date'):
+            data.append([student, date, leave_type.title(), status.title(), reason])
+
+
+        # Create table
+        table = Table(data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), (0.8, 0.8, 0.8)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), (0, 0, 0)),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), (0.9, 0.9, 0.9)),
+            ('TEXTCOLOR', (0, 1), (-1, -1), (0, 0, 0)),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, (0, 0, 0)),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        
+        elements.append(table)
+        
+        # Build PDF
+        doc.build(elements)
+
+        # Rewind and hand the original buffer to send_file; copying it
+        # through getvalue() held the PDF bytes in memory twice
+        buffer.seek(0)
+
+        logger.info("Leave report PDF generated successfully")
+        return send_file(
+            buffer,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name='leave_report.pdf'
+        )
+    except Exception as e:
+        flash(f"Error generating PDF: {str(e)}", "error")
+        logger.error(f"Error generating leave report PDF: {e}")
+        return redirect(url_for("leave"))
+
+def get_calendar_data(attendance_data):
+    """Generate calendar data from attendance records"""
+    date_columns = attendance_data.columns[1:]
+    total_students = len(attendance_data)
+
+    # Count present students for every date in one vectorized sweep
+    present = (attendance_data[date_columns].apply(lambda s: s.astype(str).str.upper()) == 'P').sum(axis=0)
+    pct = (present / total_students * 100).round(1)
+
+    return {date: {
+                'attendance_percentage': float(p),
+                'present_count': int(c),
+                'total_students': total_students
+            }
+            for date, p, c in zip(date_columns, pct, present)}
+
+def get_previous_month(year, month):
+    if month == 1:
+        return year - 1, 12
+    return year, month - 1
+
+def get_next_month(year, month):
+    if month == 12:
+        return year + 1, 1
+    return year, month + 1
+
+@app.route('/calendar')
+@login_required
+def calendar_view():
+    filepath = ATTENDANCE_CSV
+    if _attendance_stat() is None:
+        flash('Please upload attendance data first', 'error')
+        return redirect(url_for('index'))
+    
+    try:
+        # Get year and month from query parameters or use current date
+        year = int(request.args.get('year', datetime.now().year))
+        month = int(request.args.get('month', datetime.now().month))
+        
+        # Get navigation parameters
+        prev_year, prev_month = get_previous_month(year, month)
+        next_year, next_month = get_next_month(year, month)
+        
+        # Read the attendance data
+        attendance_data = _load_attendance(filepath)
+
+        # Calculate calendar data in one vectorized pass, keeping only the
+        # requested month so the template isn't handed every month
+        month_prefix = f"{year:04d}-{month:02d}-"
+        calendar_data = {date: info
+                         for date, info in get_calendar_data(attendance_data).items()
+                         if date.startswith(month_prefix)}
+
+        # Get calendar for the specified month
+        cal = calendar.monthcalendar(year, month)
+        
+        # Get month name
+        month_name = calendar.month_name[month]
+        
+        # Get today's date for highlighting
+        today = datetime.now()
+        
+        return render_template('calendar.html',
+                             cal=cal,
+                             year=year,
+                             month=month,
+                             month_name=month_name,
+                             today=today,
+                             calendar_data=calendar_data,
+                             prev_year=prev_year,
+                             prev_month=prev_month,
+                             next_year=next_year,
+                             next_month=next_month)
+                             
+    except Exception as e:
+        logger.error(f"Error in calendar view: {str(e)}")
+        flash('Error loading calendar data', 'error')
+        return redirect(url_for('index'))
+
+@app.route('/set_theme/<theme>')
+def set_theme(theme):
+    if theme in ['light', 'dark']:
+        session['theme'] = theme
+    return redirect(request.referrer or url_for('index'))
+
+# Reusable figures for generate_graphs_and_stats. Building a Figure (and
+# its Agg canvas) is the slow part of rendering small plots, so pay it once
+# and just clear the axes between requests. Created lazily because pyplot
+# itself is only imported on the first attendance request.
+_BAR_FIG = _BAR_AX = None
+_HM_FIG = None
+
+# PNG encoding and the disk write happen off the request thread so the
+# response isn't blocked on zlib + I/O. The pending list is shared by
+# the server's worker threads, so every access goes through the lock.
+_IO_POOL = ThreadPoolExecutor(max_workers=2)
+_PENDING_SAVES = []
+_SAVES_LOCK = threading.Lock()
+
+# Serializes all use of the shared figures: waitress runs several worker
+# threads, and two concurrent cache misses must not clear and draw on
+# the same Axes at once (or lazily create the figures twice)
+_RENDER_LOCK = threading.Lock()
+
+def _queue_save(fig, outpath, colors):
+    with _SAVES_LOCK:
+        _PENDING_SAVES.append(_IO_POOL.submit(_save_quantized, fig, outpath, colors))
+
+def _drain_saves():
+    """Wait for in-flight PNG writes; a failed write is logged rather than
+    re-raised so it can't surface as an error in a later, unrelated request"""
+    with _SAVES_LOCK:
+        pending = _PENDING_SAVES[:]
+        _PENDING_SAVES.clear()
+    for future in pending:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Error writing chart PNG: {e}")
+
+_GRAPH_PATH = 'static/attendance_graph.png'
+_HEATMAP_PATH = 'static/attendance_heatmap.png'
+_SUMMARY_HTML = 'static/summary.html'
+
+def _stats_fast_path(src_mtime):
+    """Rebuild the result from disk when every rendered artifact is newer
+    than the data file, bypassing the matplotlib pipeline entirely (e.g.
+    after a process restart with an unchanged CSV)"""
+    try:
+        paths = (_GRAPH_PATH, _HEATMAP_PATH, _SUMMARY_HTML)
+        if all(os.path.exists(p) and os.path.getmtime(p) > src_mtime for p in paths):
+            with open(_SUMMARY_HTML) as f:
+                return {
+                    'summary': f.read(),
+                    'graph_path': _GRAPH_PATH,
+                    'heatmap_path': _HEATMAP_PATH
+                }
+    except OSError as e:
+        logger.error(f"Error reading cached summary: {e}")
+    return None
+
+def _get_figures():
+    """Create the shared bar-chart and heatmap figures on first use.
+
+    Blocks on any PNG writes still in flight, since the figures must not
+    be cleared while a previous render is being encoded.
+    """
+    global _BAR_FIG, _BAR_AX, _HM_FIG
+    _drain_saves()
+    if _BAR_FIG is None:
+        import matplotlib.pyplot as plt
+        _BAR_FIG, _BAR_AX = plt.subplots(figsize=(12, 6))
+        # Fixed margins sized for the rotated name labels; constant-time
+        # versus tight_layout's bbox-measurement pass over every artist
+        _BAR_FIG.subplots_adjust(left=0.08, right=0.98, top=0.92, bottom=0.25)
+        _HM_FIG = plt.figure(figsize=(15, 8))
+    return _BAR_FIG, _BAR_AX, _HM_FIG
+
+def _save_quantized(fig, outpath, colors):
+    """Save a figure as a small indexed-palette PNG
+
+    Encoding at 72 dpi and quantizing the RGBA raster down to a palette
+    shrinks the file several-fold, which also means less zlib work and a
+    faster browser load for what is effectively a dashboard thumbnail.
+    """
+    import io
+    from PIL import Image
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=72)
+    buf.seek(0)
+    Image.open(buf).quantize(colors=colors, method=Image.FASTOCTREE).save(
+        outpath, optimize=False, compress_level=1)
+
+def generate_graphs_and_stats(filepath):
+    # Reject missing or empty files before any figure or parser work so
+    # known-bad inputs never reach the expensive pipeline
+    if not filepath or not os.path.isfile(filepath):
+        logger.error(f"Attendance file not found: {filepath}")
+        return None
+    # Memoize on the file's identity so repeat requests against an
+    # unchanged CSV skip the parse and render entirely; a fresh upload
+    # changes mtime/size and naturally invalidates the entry
+    try:
+        st = os.stat(filepath)
+    except OSError as e:
+        logger.error(f"Error generating graphs and stats: {e}")
+        return None
+    if st.st_size == 0:
+        logger.error(f"Attendance file is empty: {filepath}")
+        return None
+    fast = _stats_fast_path(st.st_mtime)
+    if fast is not None:
+        return fast
+    # Exceptions are caught out here, not inside the cached function, so
+    # a transient failure is never memoized for an otherwise good file
+    try:
+        return _compute_graphs_and_stats(filepath, st.st_mtime_ns, st.st_size)
+    except Exception as e:
+        logger.error(f"Error generating graphs and stats: {e}")
+        return None
+
+@lru_cache(maxsize=32)
+def _compute_graphs_and_stats(filepath, mtime_ns, size):
+    df = _load_attendance(filepath)
+    if df.shape[0] == 0 or df.shape[1] < 2:
+        logger.error(f"Attendance file has no usable data: {filepath}")
+        return None
+    df.set_index('Name', inplace=True)
+    
+    # Convert attendance values to numeric (1 for Present, 0 for Absent)
+    # in one NumPy pass instead of a deprecated per-cell applymap
+    up = np.char.upper(df.to_numpy(dtype=str))
+    mat = up == 'P'
+
+    # Calculate all three statistics from one scan of the bool matrix
+    # instead of three passes over a float DataFrame
+    total_days = mat.shape[1]
+    present_days = mat.sum(axis=1)
+    absent_days = total_days - present_days
+    attendance_percentage = np.round(present_days * (100.0 / total_days), 2)
+
+    # Build the summary table by hand in one StringIO pass; pandas'
+    # to_html dispatches a formatter per cell, which dwarfs the
+    # actual string work at this frame size. tolist() up front keeps
+    # the f-strings formatting plain Python ints and floats.
+    buf = io.StringIO()
+    buf.write('<table border="0" class="dataframe table table-striped">'
+              '<thead><tr><th></th><th>Present Days</th>'
+              '<th>Absent Days</th><th>Attendance %</th></tr></thead><tbody>')
+    buf.writelines(
+        f'<tr><th>{name}</th><td>{p}</td><td>{a}</td><td>{pct:.2f}</td></tr>'
+        for name, p, a, pct in zip(df.index.tolist(),
+                                   present_days.tolist(),
+                                   absent_days.tolist(),
+                                   attendance_percentage.tolist()))
+    buf.write('</tbody></table>')
+    summary_html = buf.getvalue()
+
+    # Persist the summary so the mtime fast path can rebuild the
+    # whole result from disk
+    with open(_SUMMARY_HTML, 'w') as f:
+        f.write(summary_html)
+    
+    # Generate graphs on the shared figures; the render lock keeps a
+    # second worker thread from clearing or drawing on them until the
+    # saves for this render have been queued
+    with _RENDER_LOCK:
+        bar_fig, bar_ax, hm_fig = _get_figures()
+        bar_ax.clear()
+        bar_ax.bar(df.index.astype(str), attendance_percentage)
+        bar_ax.set_title('Attendance Percentage by Student')
+        bar_ax.set_xlabel('Student')
+        bar_ax.set_ylabel('Attendance Percentage')
+        bar_ax.tick_params(axis='x', rotation=45)
+        _queue_save(bar_fig, _GRAPH_PATH, 64)
+
+        # Generate heatmap as a single raster with imshow rather than
+        # seaborn's per-cell QuadMesh (clear the whole figure so the
+        # colorbar from the previous render doesn't accumulate)
+        hm_fig.clf()
+        hm_ax = hm_fig.add_subplot(111)
+        # Hand imshow a contiguous 1-byte matrix so it normalizes the
+        # smallest possible buffer instead of widening to float64 first
+        heat_mat = np.ascontiguousarray(mat, dtype=np.uint8)
+        im = hm_ax.imshow(heat_mat, aspect='auto', cmap='RdYlGn', interpolation='nearest')
+        hm_fig.colorbar(im, ax=hm_ax, label='Attendance')
+        hm_ax.set_xticks(range(mat.shape[1]))
+        hm_ax.set_xticklabels(df.columns, rotation=90)
+        hm_ax.set_yticks(range(mat.shape[0]))
+        hm_ax.set_yticklabels(df.index)
+        hm_ax.set_title('Attendance Heatmap')
+        hm_ax.set_xlabel('Date')
+        hm_ax.set_ylabel('Student')
+        # Re-applied each render because the heatmap figure is fully
+        # cleared; fixed margins leave room for the rotated date labels
+        hm_fig.subplots_adjust(left=0.12, right=0.98, top=0.94, bottom=0.22)
+        # 16 colors is plenty for the smooth RdYlGn gradient at this size
+        _queue_save(hm_fig, _HEATMAP_PATH, 16)
+    
+    return {
+        'summary': summary_html,
+        'graph_path': _GRAPH_PATH,
+        'heatmap_path': _HEATMAP_PATH
+    }
+
+if __name__ == "__main__":
+    init_db()
+    try:
+        # waitress gives a threaded production WSGI server, so a slow
+        # render in one request doesn't block the others; no debugger
+        # and no double-process reloader
+        from waitress import serve
+        serve(app, host="0.0.0.0", port=5000, threads=8)
+    except ImportError:
+        app.run(debug=False, use_reloader=False)
@@ -1,35 +1,114 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-from types import SimpleNamespace
-import os
-from analytics import AttendanceAnalytics
-
-def generate_graphs_and_stats(filepath):
-    try:
-        # Use the AttendanceAnalytics class for consistency
-        analytics = AttendanceAnalytics(filepath)
-        
-        # Generate the basic graphs
-        analytics.generate_enhanced_graphs()
-        
-        # Get the summary statistics
-        stats = analytics.get_summary_statistics()
-        
-        if stats is None:
-            return None
-            
-        # Add the top_3 and bottom_3 attributes for backward compatibility
-        student_trends = stats.student_trends
-        if not student_trends:
-            return None
-            
-        sorted_students = sorted(student_trends.items(), key=lambda x: x[1]['attendance_rate'], reverse=True)
-        
-        stats.top_3 = [(name, data['attendance_rate']) for name, data in sorted_students[:3]]
-        stats.bottom_3 = [(name, data['attendance_rate']) for name, data in sorted_students[-3:]]
-        
-        return stats
-        
-    except Exception as e:
-        print(f"Error in generate_graphs_and_stats: {str(e)}")  # For debugging
-        return None
+from functools import lru_cache
+import hashlib
+import heapq
+import os
+import pickle
+from analytics import AttendanceAnalytics
+
+_STATS_CACHE_DIR = os.path.join('static', '.stats_cache')
+
+# Everything generate_enhanced_graphs renders; the heatmap alone can't
+# act as the freshness sentinel because app.py's index pipeline writes
+# a file of the same name
+_ENHANCED_PNGS = (
+    'static/attendance_percent_chart.png',
+    'static/attendance_trend_line.png',
+    'static/overall_attendance_pie.png',
+    'static/monthly_attendance_trend.png',
+    'static/day_wise_attendance.png',
+    'static/attendance_heatmap.png',
+)
+
+def _charts_fresh(src_mtime):
+    """True when every analytics chart is newer than the data file"""
+    for path in _ENHANCED_PNGS:
+        if not os.path.exists(path) or os.path.getmtime(path) <= src_mtime:
+            return False
+    return True
+
+def _stats_cache_path(filepath, mtime_ns, size):
+    key = hashlib.sha1(f'{filepath}:{mtime_ns}:{size}'.encode()).hexdigest()
+    return os.path.join(_STATS_CACHE_DIR, f'{key}.pkl')
+
+def _load_cached_stats(cache_path):
+    """Read a previously pickled stats object; None on any miss"""
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+def _store_cached_stats(cache_path, stats):
+    """Persist the stats object so a later process can skip recomputing"""
+    try:
+        os.makedirs(_STATS_CACHE_DIR, exist_ok=True)
+        with open(cache_path, 'wb') as f:
+            pickle.dump(stats, f, protocol=5)
+    except OSError as e:
+        print(f"Error writing stats cache: {str(e)}")  # For debugging
+
+def generate_graphs_and_stats(filepath):
+    # Reject missing or empty files up front so known-bad inputs never
+    # reach the analytics pipeline
+    if not filepath or not os.path.isfile(filepath):
+        return None
+    # Memoize on the file's identity so repeat calls against an unchanged
+    # CSV reuse the computed stats; a new upload changes mtime/size and
+    # naturally invalidates the entry
+    try:
+        st = os.stat(filepath)
+    except OSError as e:
+        print(f"Error in generate_graphs_and_stats: {str(e)}")  # For debugging
+        return None
+    if st.st_size == 0:
+        return None
+    # Exceptions are caught out here, not inside the cached function, so
+    # a transient failure is never memoized for an otherwise good file
+    try:
+        return _compute(filepath, st.st_mtime_ns, st.st_size)
+    except Exception as e:
+        print(f"Error in generate_graphs_and_stats: {str(e)}")  # For debugging
+        return None
+
+@lru_cache(maxsize=32)
+def _compute(filepath, mtime_ns, size):
+    # Skip the matplotlib pipeline when the rendered charts are
+    # already newer than the data file; the stats alone are cheap
+    charts_fresh = _charts_fresh(os.path.getmtime(filepath))
+
+    # With fresh charts, a pickled stats object from a previous
+    # process answers the whole call without touching the CSV
+    cache_path = _stats_cache_path(filepath, mtime_ns, size)
+    if charts_fresh:
+        cached = _load_cached_stats(cache_path)
+        if cached is not None:
+            return cached
+
+    # Use the AttendanceAnalytics class for consistency
+    analytics = AttendanceAnalytics(filepath)
+
+    if charts_fresh:
+        stats = analytics.get_summary_statistics()
+    else:
+        # One fused pass computes the stats and renders the graphs
+        # from the same cached reductions
+        stats = analytics.compute_all()
+
+    if stats is None:
+        return None
+        
+    # Add the top_3 and bottom_3 attributes for backward compatibility
+    student_trends = stats.student_trends
+    if not student_trends:
+        return None
+        
+    # Partial selection beats a full sort when we only need 3 of each
+    key = lambda x: x[1]['attendance_rate']
+    top = heapq.nlargest(3, student_trends.items(), key=key)
+    bottom = heapq.nsmallest(3, student_trends.items(), key=key)
+
+    stats.top_3 = [(name, data['attendance_rate']) for name, data in top]
+    stats.bottom_3 = [(name, data['attendance_rate']) for name, data in bottom[::-1]]
+
+    _store_cached_stats(cache_path, stats)
+    return stats